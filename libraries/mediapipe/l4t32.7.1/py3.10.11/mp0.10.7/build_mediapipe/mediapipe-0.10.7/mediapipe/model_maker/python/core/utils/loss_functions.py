@@ -156,8 +156,50 @@ class SparseFocalLoss(FocalLoss):
       sample_weight: Optional[tf.Tensor] = None,
   ) -> tf.Tensor:
     y_true = tf.cast(tf.reshape(y_true, [-1]), tf.int32)
-    y_true_one_hot = tf.one_hot(y_true, self._num_classes)
-    return super().__call__(y_true_one_hot, y_pred, sample_weight=sample_weight)
+    if self._class_weight:
+      class_weight = tf.convert_to_tensor(self._class_weight, dtype=tf.float32)
+      loss_weight = tf.gather(class_weight, y_true)
+    else:
+      loss_weight = tf.ones(tf.shape(y_true)[0])
+    if sample_weight is None:
+      sample_weight = tf.constant(1.0)
+    if sample_weight.shape.ndims not in (0, 1):
+      raise ValueError('Unexpected sample_weights, should be either a scalar'
+                       'or a vector of batch_size')
+    return self._fused_loss(y_true, y_pred, sample_weight, loss_weight)
+
+  @tf.function(jit_compile=True)
+  def _fused_loss(
+      self,
+      y_true: tf.Tensor,
+      y_pred: tf.Tensor,
+      sample_weight: tf.Tensor,
+      loss_weight: tf.Tensor,
+  ) -> tf.Tensor:
+    """Computes the focal loss from sparse labels as one XLA-fused kernel.
+
+    Gathers the true-class probability per example instead of materializing
+    a (batch_size, num_classes) one-hot matrix and masking; mathematically
+    identical to FocalLoss.__call__ on the one-hot labels. Note y_pred holds
+    softmax probabilities, not logits, so the cross-entropy is computed from
+    the gathered probabilities directly.
+
+    Args:
+      y_true: Class id per example, shape (batch_size,).
+      y_pred: Predicted probabilities, shape (batch_size, num_classes).
+      sample_weight: Scalar or per-example weight.
+      loss_weight: Per-example class weight.
+
+    Returns:
+      The scalar loss, reduced with sum_over_batch_size.
+    """
+    batch_size = tf.cast(tf.shape(y_pred)[0], y_pred.dtype)
+    p = tf.gather(y_pred, y_true, axis=1, batch_dims=1)
+    p = tf.clip_by_value(p, self._epsilon, 1 - self._epsilon)
+    ce = -tf.math.log(p)
+    modulating_factor = tf.math.pow(1 - p, self._gamma)
+    losses = modulating_factor * ce * sample_weight * loss_weight
+    return tf.reduce_sum(losses) / batch_size
 
 
 @dataclasses.dataclass
@@ -117,6 +117,13 @@ class ModelUtilTest(tf.test.TestCase, parameterized.TestCase):
     test_util.test_tflite(
         keras_model=model, tflite_model=tflite_model, size=[1, input_dim])
 
+  def test_convert_to_tflite_from_keras_model(self):
+    input_dim = 4
+    model = test_util.build_model(input_shape=[input_dim], num_classes=2)
+    tflite_model = model_util.convert_to_tflite_from_keras_model(model)
+    test_util.test_tflite(
+        keras_model=model, tflite_model=tflite_model, size=[1, input_dim])
+
   @parameterized.named_parameters(
       dict(
           testcase_name='dynamic_quantize',
@@ -50,7 +50,13 @@ def _get_representative_dataset_generator(dataset: tf.data.Dataset,
   def representative_dataset_gen():
     """Generates representative dataset for quantization."""
     for data, _ in dataset.take(num_steps):
-      yield [data]
+      if isinstance(data, dict):
+        # Multi-input models (e.g. BERT) preprocess into a features dict. The
+        # calibrator matches dict entries to model inputs by name, which a
+        # single-element list of the dict would not.
+        yield dict(data)
+      else:
+        yield [data]
 
   return representative_dataset_gen
 
@@ -18,7 +18,7 @@ import collections
 import hashlib
 import os
 import re
-from typing import Mapping, Sequence, Tuple, Union
+from typing import Iterable, Mapping, Optional, Sequence, Tuple, Union
 
 import tensorflow as tf
 import tensorflow_hub
@@ -88,11 +88,20 @@ def _tfrecord_dataset(
   Returns:
     Dataset containing BERT model input features and labels.
   """
-  d = tf.data.TFRecordDataset(tfrecord_files)
+  # Read the shards in parallel rather than sequentially so record reading
+  # overlaps with decoding and with the GPU training step.
+  d = tf.data.Dataset.from_tensor_slices(list(tfrecord_files)).interleave(
+      tf.data.TFRecordDataset,
+      num_parallel_calls=tf.data.AUTOTUNE,
+      deterministic=False)
+  # Decode order doesn't matter: examples feed a shuffled training pipeline
+  # or order-independent evaluation metrics, so give the parallel map
+  # scheduling slack with deterministic=False.
   d = d.map(
       lambda record: _decode_record(record, name_to_features),
-      num_parallel_calls=tf.data.AUTOTUNE)
-  return d
+      num_parallel_calls=tf.data.AUTOTUNE,
+      deterministic=False)
+  return d.prefetch(tf.data.AUTOTUNE)
 
 
 class AverageWordEmbeddingClassifierPreprocessor:
@@ -111,19 +120,25 @@ class AverageWordEmbeddingClassifierPreprocessor:
   START: str = "<START>"  # Index: 1
   UNKNOWN: str = "<UNKNOWN>"  # Index: 2
 
-  def __init__(self, seq_len: int, do_lower_case: bool, texts: Sequence[str],
+  # Number of examples tokenized per `preprocess` map call. Tokenizing batched
+  # string tensors amortizes the op-dispatch overhead over the whole batch.
+  _PREPROCESS_BATCH_SIZE = 256
+
+  def __init__(self, seq_len: int, do_lower_case: bool, texts: Iterable[str],
                vocab_size: int):
     self._seq_len = seq_len
     self._do_lower_case = do_lower_case
     self._vocab = self._gen_vocab(texts, vocab_size)
+    self._vocab_table = None
 
-  def _gen_vocab(self, texts: Sequence[str],
+  def _gen_vocab(self, texts: Iterable[str],
                  vocab_size: int) -> Mapping[str, int]:
     """Generates vocabulary list in `texts` with size `vocab_size`.
 
     Args:
       texts: All texts (across training and validation data) that will be
-        preprocessed by the model.
+        preprocessed by the model. May be any iterable: texts are consumed
+        one at a time so only the running token counts stay in memory.
       vocab_size: Size of the vocab.
 
     Returns:
@@ -132,9 +147,7 @@ class AverageWordEmbeddingClassifierPreprocessor:
     vocab_counter = collections.Counter()
 
     for text in texts:
-      tokens = self._regex_tokenize(text)
-      for token in tokens:
-        vocab_counter[token] += 1
+      vocab_counter.update(self._regex_tokenize(text))
 
     vocab_freq = vocab_counter.most_common(vocab_size)
     vocab_list = [self.PAD, self.START, self.UNKNOWN
@@ -188,6 +201,49 @@ class AverageWordEmbeddingClassifierPreprocessor:
       token_ids = token_ids[:self._seq_len]
     return token_ids
 
+  def _get_vocab_table(self) -> tf.lookup.StaticHashTable:
+    """Returns a lookup table mapping tokens to their vocab IDs."""
+    if self._vocab_table is None:
+      self._vocab_table = tf.lookup.StaticHashTable(
+          tf.lookup.KeyValueTensorInitializer(
+              keys=tf.constant(list(self._vocab.keys())),
+              values=tf.constant(list(self._vocab.values()), dtype=tf.int32),
+          ),
+          default_value=self._vocab[self.UNKNOWN],
+      )
+    return self._vocab_table
+
+  def _tokenize_and_pad_batch(self, texts: tf.Tensor) -> tf.Tensor:
+    """Tokenizes a batch of texts and pads the tokens to `seq_len`.
+
+    Batched tensor equivalent of `_tokenize_and_pad` which runs on whole
+    string tensors at once instead of dispatching ops per example.
+
+    Args:
+      texts: Batch of texts to be tokenized and padded, with shape [batch].
+
+    Returns:
+      Tensor of token IDs with shape [batch, seq_len].
+    """
+    texts = tf.strings.strip(texts)
+    if self._do_lower_case:
+      texts = tf.strings.lower(texts, encoding="utf-8")
+    # Replaces delimiter runs with a single space and splits on whitespace,
+    # which also filters out empty tokens. regex_replace uses RE2, where \w
+    # is ASCII-only, so spell out the Unicode classes to match the Python
+    # `re` pattern used for vocab generation in `_regex_tokenize`.
+    tokens = tf.strings.split(
+        tf.strings.regex_replace(texts, r"[^\p{L}\p{N}_\']+", " ")
+    )
+    token_ids = self._get_vocab_table().lookup(tokens)
+    start_ids = tf.fill([tf.shape(texts)[0], 1], self._vocab[self.START])
+    token_ids = tf.concat(
+        [tf.RaggedTensor.from_tensor(start_ids), token_ids], axis=1
+    )
+    return token_ids.to_tensor(
+        default_value=self._vocab[self.PAD], shape=[None, self._seq_len]
+    )
+
   def preprocess(
       self, dataset: text_classifier_ds.Dataset) -> text_classifier_ds.Dataset:
     """Preprocesses data into input for an Average Word Embedding model.
@@ -198,17 +254,21 @@ class AverageWordEmbeddingClassifierPreprocessor:
     Returns:
       Dataset containing (token IDs, label) data.
     """
-    token_ids_list = []
-    labels_list = []
-    for text, label in dataset.gen_tf_dataset():
+    for text, label in dataset.gen_tf_dataset().take(1):
       _validate_text_and_label(text, label)
-      token_ids = self._tokenize_and_pad(text.numpy()[0].decode("utf-8"))
-      token_ids_list.append(token_ids)
-      labels_list.append(label.numpy()[0])
-
-    token_ids_ds = tf.data.Dataset.from_tensor_slices(token_ids_list)
-    labels_ds = tf.data.Dataset.from_tensor_slices(labels_list)
-    preprocessed_ds = tf.data.Dataset.zip((token_ids_ds, labels_ds))
+    preprocessed_ds = (
+        dataset.gen_tf_dataset(batch_size=self._PREPROCESS_BATCH_SIZE)
+        .map(
+            lambda texts, labels: (
+                self._tokenize_and_pad_batch(tf.reshape(texts, [-1])),
+                tf.reshape(labels, [-1]),
+            ),
+            num_parallel_calls=tf.data.AUTOTUNE,
+        )
+        .unbatch()
+        # Tokenization only runs once; later epochs replay the cache.
+        .cache()
+    )
     return text_classifier_ds.Dataset(
         dataset=preprocessed_ds,
         size=dataset.size,
@@ -226,6 +286,9 @@ class BertClassifierPreprocessor:
       cached files with specific Bert model vocab.
     preprocessor: Which preprocessor to use. Must be one of the enum values of
       SupportedBertPreprocessors.
+    cache_path: Optional directory for the tf.data.Dataset cache of the decoded
+      features. If None, the decoded features are cached in memory so they are
+      only parsed from the TFRecord files once and replayed on later epochs.
   """
 
   def __init__(
@@ -235,6 +298,7 @@ class BertClassifierPreprocessor:
       uri: str,
       model_name: str,
       tokenizer: bert_tokenizer.SupportedBertTokenizers,
+      cache_path: Optional[str] = None,
   ):
     self._seq_len = seq_len
     # Vocab filepath is tied to the BERT module's URI.
@@ -256,6 +320,7 @@ class BertClassifierPreprocessor:
     else:
       raise ValueError(f"Unsupported tokenizer: {tokenizer}")
     self._model_name = model_name
+    self._cache_path = cache_path
 
   def _get_name_to_features(self):
     """Gets the dictionary mapping record keys to feature types."""
@@ -361,6 +426,17 @@ class BertClassifierPreprocessor:
     preprocessed_ds = _tfrecord_dataset(
         tfrecord_cache_files.tfrecord_files, self._get_name_to_features()
     )
+    # Cache the decoded features so the TFRecord parse only runs on the first
+    # epoch. Caching happens before the shuffle/batch applied by
+    # `gen_tf_dataset`, which preserves per-epoch shuffling.
+    if self._cache_path is None:
+      preprocessed_ds = preprocessed_ds.cache()
+    else:
+      preprocessed_ds = preprocessed_ds.cache(
+          os.path.join(
+              self._cache_path, tfrecord_cache_files.cache_prefix_filename
+          )
+      )
     return text_classifier_ds.Dataset(
         dataset=preprocessed_ds,
         size=size,
@@ -23,6 +23,7 @@ import tensorflow as tf
 
 from mediapipe.model_maker.python.core.utils import loss_functions
 from mediapipe.model_maker.python.text import text_classifier
+from mediapipe.model_maker.python.text.text_classifier import text_classifier as text_classifier_module
 from mediapipe.tasks.python.test import test_utils
 
 
@@ -81,6 +82,13 @@ class TextClassifierTest(tf.test.TestCase, parameterized.TestCase):
     metrics = average_word_embedding_classifier.evaluate(validation_data)
     self.assertGreaterEqual(metrics[1], 0.0)  # metrics[1] is accuracy
 
+    # The embedding lookup and mean pooling run as a single fused layer.
+    layer_types = [
+        type(layer).__name__
+        for layer in average_word_embedding_classifier._model.layers
+    ]
+    self.assertIn('_EmbeddingMean', layer_types)
+
     # Test export_model
     average_word_embedding_classifier.export_model()
     output_metadata_file = os.path.join(options.hparams.export_dir,
@@ -203,6 +211,24 @@ class TextClassifierTest(tf.test.TestCase, parameterized.TestCase):
           train_data, validation_data, bert_options
       )
 
+  def test_bert_int8_export_requires_trained_model(self):
+    supported_model = text_classifier.SupportedModels.MOBILEBERT_CLASSIFIER
+    bert_classifier = text_classifier_module._BertClassifier(
+        model_spec=supported_model.value(),
+        model_options=text_classifier.BertModelOptions(),
+        hparams=text_classifier.BertHParams(
+            epochs=1,
+            batch_size=1,
+            learning_rate=3e-5,
+            distribution_strategy='off',
+        ),
+        label_names=['neg', 'pos'],
+    )
+    with self.assertRaisesRegex(
+        ValueError, 'Full-integer quantization requires'
+    ):
+      bert_classifier.export_model(int8_quantization=True)
+
   def test_bert_loss_and_metrics_creation(self):
     train_data, validation_data = self._get_data()
     supported_model = text_classifier.SupportedModels.MOBILEBERT_CLASSIFIER
@@ -39,6 +39,10 @@ class BaseHParams:
     class_weights: An optional mapping of indices to weights for weighting the
       loss function during training.
     shuffle: True if the dataset is shuffled before training.
+    jit_compile: True if the training step should be compiled with XLA. XLA
+      fuses the elementwise op chains between matmuls, which cuts kernel
+      launches and intermediate activation traffic. Defaults to False since
+      not every op or hardware target supports XLA.
     export_dir: The location of the model checkpoint files.
     distribution_strategy: A string specifying which Distribution Strategy to
       use. Accepted values are 'off', 'one_device', 'mirrored',
@@ -64,6 +68,9 @@ class BaseHParams:
   # Dataset-related parameters
   shuffle: bool = False
 
+  # Parameters for training performance
+  jit_compile: bool = False
+
   # Parameters for model / checkpoint files
   export_dir: str = tempfile.mkdtemp()
 
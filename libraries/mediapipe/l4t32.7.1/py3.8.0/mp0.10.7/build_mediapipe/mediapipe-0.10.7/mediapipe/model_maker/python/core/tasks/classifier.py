@@ -93,6 +93,7 @@ class Classifier(custom_model.CustomModel):
         optimizer=self._optimizer,
         loss=self._loss_function,
         metrics=self._metric_functions,
+        jit_compile=self._hparams.jit_compile,
     )
 
     latest_checkpoint = (
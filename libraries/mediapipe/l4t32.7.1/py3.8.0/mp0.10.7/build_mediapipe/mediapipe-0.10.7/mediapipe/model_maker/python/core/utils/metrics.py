@@ -94,6 +94,102 @@ def _get_sparse_metric(metric: tf.metrics.Metric):
   return SparseMetric
 
 
+class BinarySparsePrecisionRecallCurve(tf.metrics.AUC):
+  """Shared precision/recall curve accumulator for binary sparse labels.
+
+  Accumulates the thresholded true/false positive/negative counts once per
+  batch. Metrics created through `recall_at_precision` and
+  `precision_at_recall` derive their values from this shared state instead of
+  each keeping their own num_thresholds-sized accumulators, so the per-step
+  cost stays O(num_thresholds) regardless of how many derived metrics are
+  registered. The curve itself is not meant to be compiled into the model's
+  metric list: the first derived metric owns the shared update, so the
+  compiled metric names and ordering stay exactly the requested ones.
+
+  As with the BinarySparse metrics above, update_state(y_true, y_pred) takes
+  y_true=(batch_size, 1) sparse labels and y_pred=(batch_size, 2) scores,
+  where class_id=1 is the positive class.
+  """
+
+  def __init__(self, num_thresholds: int = 1000, name: str = 'pr_curve'):
+    super().__init__(curve='PR', num_thresholds=num_thresholds, name=name)
+    self._has_owner = False
+
+  def _claim_ownership(self) -> bool:
+    """Returns True for the first caller, which then drives the updates."""
+    if self._has_owner:
+      return False
+    self._has_owner = True
+    return True
+
+  def update_state(self, y_true, y_pred, sample_weight=None):
+    y_true = tf.cast(tf.reshape(y_true, [-1]), tf.int32)
+    y_pred = tf.convert_to_tensor(y_pred)
+    return super().update_state(
+        y_true, y_pred[:, 1], sample_weight=sample_weight
+    )
+
+  def recall_at_precision(
+      self, desired_precision: float, name: str
+  ) -> '_BinarySparsePRCurveMetric':
+    """Returns a metric tracking the best recall at the desired precision."""
+    return _BinarySparsePRCurveMetric(self, 'recall', desired_precision, name)
+
+  def precision_at_recall(
+      self, desired_recall: float, name: str
+  ) -> '_BinarySparsePRCurveMetric':
+    """Returns a metric tracking the best precision at the desired recall."""
+    return _BinarySparsePRCurveMetric(self, 'precision', desired_recall, name)
+
+
+class _BinarySparsePRCurveMetric(tf.keras.metrics.Metric):
+  """Reads a recall@precision or precision@recall value off a shared curve.
+
+  The first wrapper created from a given curve owns the shared state: it
+  forwards update_state and reset_state to the curve, while later wrappers
+  are pure readers. The curve itself never has to be registered as a metric.
+  """
+
+  def __init__(
+      self,
+      curve: BinarySparsePrecisionRecallCurve,
+      find: str,
+      constraint: float,
+      name: str,
+  ):
+    super().__init__(name=name, dtype=curve.dtype)
+    self._curve = curve
+    self._find = find
+    self._constraint = constraint
+    self._owns_curve = curve._claim_ownership()
+
+  def update_state(self, y_true, y_pred, sample_weight=None):
+    # The owning wrapper accumulates the thresholded counts on the shared
+    # curve once per batch; the other wrappers only read them in result().
+    if self._owns_curve:
+      return self._curve.update_state(y_true, y_pred, sample_weight)
+
+  def reset_state(self):
+    if self._owns_curve:
+      self._curve.reset_state()
+
+  def result(self):
+    tp = self._curve.true_positives
+    fp = self._curve.false_positives
+    fn = self._curve.false_negatives
+    precisions = tf.math.divide_no_nan(tp, tp + fp)
+    recalls = tf.math.divide_no_nan(tp, tp + fn)
+    if self._find == 'recall':
+      values, constrained = recalls, precisions
+    else:
+      values, constrained = precisions, recalls
+    # Best feasible value under the constraint, 0 if none is feasible; same
+    # convention as tf.metrics.RecallAtPrecision / PrecisionAtRecall.
+    return tf.reduce_max(
+        tf.where(constrained >= self._constraint, values, tf.zeros_like(values))
+    )
+
+
 SparseRecall = _get_sparse_metric(tf.metrics.Recall)
 SparsePrecision = _get_sparse_metric(tf.metrics.Precision)
 BinarySparseRecallAtPrecision = _get_binary_sparse_metric(
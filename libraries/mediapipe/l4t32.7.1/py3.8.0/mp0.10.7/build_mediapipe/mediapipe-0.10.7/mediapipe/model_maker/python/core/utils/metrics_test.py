@@ -58,6 +58,43 @@ class SparseMetricTest(tf.test.TestCase, parameterized.TestCase):
     metric = metrics.BinarySparsePrecisionAtRecall(0.7)
     self._assert_metric_equals(metric, 3 / 4)
 
+  def test_pr_curve_recall_at_precision(self):
+    curve = metrics.BinarySparsePrecisionRecallCurve()
+    metric = curve.recall_at_precision(1.0, name='recall_at_precision_1.0')
+    self._assert_metric_equals(metric, 0.0)  # impossible to achieve precision=1
+    curve = metrics.BinarySparsePrecisionRecallCurve()
+    metric = curve.recall_at_precision(0.4, name='recall_at_precision_0.4')
+    self._assert_metric_equals(metric, 1.0)
+
+  def test_pr_curve_precision_at_recall(self):
+    curve = metrics.BinarySparsePrecisionRecallCurve()
+    metric = curve.precision_at_recall(1.0, name='precision_at_recall_1.0')
+    self._assert_metric_equals(metric, 3 / 4)
+    curve = metrics.BinarySparsePrecisionRecallCurve()
+    metric = curve.precision_at_recall(0.7, name='precision_at_recall_0.7')
+    self._assert_metric_equals(metric, 3 / 4)
+
+  def test_pr_curve_metrics_share_one_update(self):
+    curve = metrics.BinarySparsePrecisionRecallCurve()
+    recall_metric = curve.recall_at_precision(
+        0.4, name='recall_at_precision_0.4'
+    )
+    precision_metric = curve.precision_at_recall(
+        1.0, name='precision_at_recall_1.0'
+    )
+    # Keras calls update_state on every compiled metric; only the first
+    # derived metric forwards the update to the shared curve, so the counts
+    # are accumulated once despite two registered metrics.
+    recall_metric.update_state(self.y_true, self.y_pred)
+    precision_metric.update_state(self.y_true, self.y_pred)
+    self.assertEqual(tf.reduce_max(curve.true_positives), 3.0)
+    self.assertEqual(recall_metric.result(), 1.0)
+    self.assertEqual(precision_metric.result(), 3 / 4)
+    # Only the owning metric resets the shared state.
+    recall_metric.reset_state()
+    precision_metric.reset_state()
+    self.assertEqual(tf.reduce_max(curve.true_positives), 0.0)
+
   def test_binary_sparse_precision_at_recall_class_id_error(self):
     # class_id=1 case should not error
     _ = metrics.BinarySparsePrecisionAtRecall(1.0, class_id=1)
@@ -149,7 +149,10 @@ def convert_to_tflite_from_file(
     )
 
   converter.allow_custom_ops = allow_custom_ops
-  converter.target_spec.supported_ops = supported_ops
+  # Don't clobber the ops set when the quantization config already picked one,
+  # e.g. TFLITE_BUILTINS_INT8 for full-integer quantization.
+  if not (quantization_config and quantization_config.supported_ops):
+    converter.target_spec.supported_ops = supported_ops
   tflite_model = converter.convert()
   return tflite_model
 
@@ -194,6 +197,48 @@ def convert_to_tflite(
     )
 
 
+def convert_to_tflite_from_keras_model(
+    model: tf.keras.Model,
+    quantization_config: Optional[quantization.QuantizationConfig] = None,
+    supported_ops: Tuple[tf.lite.OpsSet, ...] = (
+        tf.lite.OpsSet.TFLITE_BUILTINS,
+    ),
+    preprocess: Optional[Callable[..., Any]] = None,
+    allow_custom_ops: bool = False,
+) -> bytearray:
+  """Converts an in-memory Keras model to TFLite format.
+
+  Unlike convert_to_tflite, the model is handed directly to the converter
+  instead of being serialized to a SavedModel and re-parsed from disk, which
+  avoids a full-model write and read per conversion.
+
+  Args:
+    model: Keras model to be converted to TFLite.
+    quantization_config: Configuration for post-training quantization.
+    supported_ops: A list of supported ops in the converted TFLite file.
+    preprocess: A callable to preprocess the representative dataset for
+      quantization. The callable takes three arguments in order: feature, label,
+      and is_training.
+    allow_custom_ops: A boolean flag to enable custom ops in model conversion.
+      Default to False.
+
+  Returns:
+    bytearray of TFLite model
+  """
+  converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+  if quantization_config:
+    converter = quantization_config.set_converter_with_quantization(
+        converter, preprocess=preprocess
+    )
+
+  converter.allow_custom_ops = allow_custom_ops
+  if not (quantization_config and quantization_config.supported_ops):
+    converter.target_spec.supported_ops = supported_ops
+  tflite_model = converter.convert()
+  return tflite_model
+
+
 def save_tflite(tflite_model: bytearray, tflite_file: str) -> None:
   """Saves TFLite file to tflite_file.
 
@@ -101,9 +101,16 @@ class BertFastTokenizer(BertTokenizer):
         lower_case_nfd_strip_accents=do_lower_case,
     )
     self._seq_len = seq_len
-    self._cls_id = vocab.index("[CLS]")
-    self._sep_id = vocab.index("[SEP]")
-    self._pad_id = vocab.index("[PAD]")
+    # One pass over the vocab instead of a linear index() scan per special
+    # token.
+    special_token_ids = {
+        token: token_id
+        for token_id, token in enumerate(vocab)
+        if token in ("[CLS]", "[SEP]", "[PAD]")
+    }
+    self._cls_id = special_token_ids["[CLS]"]
+    self._sep_id = special_token_ids["[SEP]"]
+    self._pad_id = special_token_ids["[PAD]"]
 
   def process_fn(self, input_tensor: tf.Tensor) -> Mapping[str, tf.Tensor]:
     """Tensor implementation of the process function.
@@ -15,7 +15,7 @@
 
 import dataclasses
 import enum
-from typing import Sequence, Union
+from typing import Optional, Sequence, Union
 
 from mediapipe.model_maker.python.core import hyperparameters as hp
 from mediapipe.model_maker.python.text.text_classifier import bert_tokenizer
@@ -56,6 +56,15 @@ class BertHParams(hp.BaseHParams):
       value to 0. Defaults to 2.0.
     tokenizer: Tokenizer to use for preprocessing. Must be one of the enum
       options of SupportedBertTokenizers. Defaults to FULL_TOKENIZER.
+    cache_path: Optional directory for the tf.data.Dataset cache of the
+      tokenized features. If None, the tokenized features are cached in memory
+      after the first epoch. Set this to spill the cache to disk for corpora
+      that don't fit in RAM.
+    precision_policy: Optional Keras mixed precision policy name used when
+      building and training the model, e.g. "mixed_float16" on GPUs with
+      tensor cores or "mixed_bfloat16" where bfloat16 is supported. The
+      classification head always computes in float32. Defaults to None which
+      keeps the default float32 policy.
   """
 
   learning_rate: float = 3e-5
@@ -75,5 +84,9 @@ class BertHParams(hp.BaseHParams):
       bert_tokenizer.SupportedBertTokenizers.FULL_TOKENIZER
   )
 
+  cache_path: Optional[str] = None
+
+  precision_policy: Optional[str] = None
+
 
 HParams = Union[BertHParams, AverageWordEmbeddingHParams]
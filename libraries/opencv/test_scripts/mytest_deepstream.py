@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+
+# Decode multiple RTSP streams with DeepStream elements and process the
+# frames with OpenCV.
+
+import ctypes
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+import gi
+
+gi.require_version("Gst", "1.0")
+gi.require_version("GstApp", "1.0")
+from gi.repository import Gst, GstApp, GLib  # noqa: F401 (GstApp adds the
+# appsink pull API to the introspected element class)
+
+# Optional direct-NVDEC path: PyAV demuxes the RTSP bitstream (no decode)
+# and PyNvVideoCodec feeds it straight to the hardware decoder.
+try:
+    import PyNvVideoCodec as pnvc
+except ImportError:
+    pnvc = None
+try:
+    import av
+except ImportError:
+    av = None
+
+Gst.init(None)
+
+
+class DeepStreamOpenCVProcessor:
+    def __init__(self, rtsp_urls):
+        self.rtsp_urls = rtsp_urls
+        self.loop = GLib.MainLoop()
+        # CUDA resources are created once and reused — and one set per
+        # stream, since each pull thread processes its own frames
+        # concurrently: GpuMats, the Canny detector and the cascade are all
+        # stateful and not thread-safe, and per-stream CUDA streams let the
+        # GPU work overlap. The streams are created non-blocking
+        # (cudaStreamNonBlocking): work on the default stream would
+        # implicitly synchronize with NVDEC's decode stream and make the
+        # FPS oscillate.
+        n = len(rtsp_urls)
+        self.cuda_streams = {i: cv2.cuda_Stream(1) for i in range(n)}
+        self.gpu_grays = {i: cv2.cuda_GpuMat() for i in range(n)}
+        self.cannys = {i: cv2.cuda.createCannyEdgeDetector(100, 200)
+                       for i in range(n)}
+        cascade_xml = (
+            cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        try:
+            self.face_cascades = {
+                i: cv2.cuda_CascadeClassifier.create(cascade_xml)
+                for i in range(n)}
+            self.cascade_on_gpu = True
+        except (AttributeError, cv2.error):
+            # Build without cudaobjdetect: keep the Haar stage on the CPU.
+            self.face_cascades = {i: cv2.CascadeClassifier(cascade_xml)
+                                  for i in range(n)}
+            self.cascade_on_gpu = False
+        self._nvbufsurface = None
+        self._warned_no_nvbufsurface = False
+
+        pipeline_str = self.build_pipeline()
+        print(pipeline_str)
+        self.pipeline = Gst.parse_launch(pipeline_str)
+
+        # Samples are pulled from dedicated threads instead of a GObject
+        # signal per frame: signal marshalling crosses the Python/GI
+        # boundary twice per sample and caps aggregate throughput.
+        self.sinks = []
+        for i in range(len(rtsp_urls)):
+            sink = self.pipeline.get_by_name(f"appsink{i}")
+            sink.set_property("emit-signals", False)
+            self.sinks.append(sink)
+        self.running = True
+
+    def build_pipeline(self):
+        # Batch all the sources into one nvstreammux, then split the batch
+        # back into per-stream pads with nvstreamdemux: unlike a tee with a
+        # second mux per branch, the demux picks each stream's surface out of
+        # the batch without rebatching it.
+        # Assemble the sections in lists and join once at the end: prepending
+        # to a growing string in a loop is quadratic and makes the source /
+        # mux / branch ordering hard to audit.
+        n = len(self.rtsp_urls)
+        mux_chunk = (
+            f"nvstreammux name=mux batch-size={n} width=1280 height=720 "
+            f"batched-push-timeout=40000 ! nvvideoconvert ! "
+            f"nvstreamdemux name=demux"
+        )
+        src_chunks = []
+        for i, url in enumerate(self.rtsp_urls):
+            src_chunks.append(
+                # latency=0 disables the jitter buffer, so any network
+                # hiccup turns into drops and retransmit stalls that leave
+                # NVDEC alternating between idle and bursts. A 200 ms buffer
+                # over TCP keeps the bitstream feed smooth.
+                f"rtspsrc location={url} protocols=tcp latency=200 "
+                f"drop-on-latency=true ! "
+                f"rtpjitterbuffer latency=200 drop-on-latency=true ! "
+                f"rtph264depay ! h264parse ! nvv4l2decoder ! "
+                f"queue ! mux.sink_{i}"
+            )
+        branch_chunks = []
+        for i in range(n):
+            # Stay in NVMM device memory all the way to the appsink. Asking
+            # nvvideoconvert for BGR in system memory here would copy every
+            # full-resolution frame out of device memory per stream.
+            branch_chunks.append(
+                f"demux.src_{i} ! nvvideoconvert ! "
+                f"video/x-raw(memory:NVMM),format=NV12 ! "
+                # A short leaky queue decouples the decoder from the Python
+                # consumer so a slow callback drops frames instead of
+                # stalling NVDEC.
+                f"queue leaky=downstream max-size-buffers=4 "
+                f"max-size-bytes=0 max-size-time=0 ! "
+                f"appsink name=appsink{i} max-buffers=4 drop=true sync=false"
+            )
+        return " ".join(src_chunks + [mux_chunk] + branch_chunks)
+
+    def pull_samples(self, stream_id):
+        sink = self.sinks[stream_id]
+        while self.running:
+            # The timeout lets the thread notice shutdown.
+            sample = sink.try_pull_sample(Gst.SECOND)
+            if sample is not None:
+                self.handle_sample(sample, stream_id)
+
+    def handle_sample(self, sample, stream_id):
+        buf = sample.get_buffer()
+        caps = sample.get_caps().get_structure(0)
+        width = caps.get_value("width")
+        height = caps.get_value("height")
+
+        # pyds.get_nvds_buf_surface only supports RGBA surfaces and raises on
+        # the NV12 these branches are capped to, so NVMM buffers always go
+        # through the libnvbufsurface mapping.
+        surface = self.map_nvbuf_surface(buf, width, height)
+        if surface is not None:
+            self.process_frame(surface, width, height, stream_id)
+
+    def map_nvbuf_surface(self, buf, width, height):
+        # The mapped data of an NVMM buffer is an NvBufSurface, which
+        # libnvbufsurface can map for CPU access.
+        if self._nvbufsurface is None:
+            try:
+                self._nvbufsurface = ctypes.CDLL("libnvbufsurface.so")
+            except OSError:
+                if not self._warned_no_nvbufsurface:
+                    print("libnvbufsurface unavailable, "
+                          "cannot read NVMM frames")
+                    self._warned_no_nvbufsurface = True
+                return None
+        ok, map_info = buf.map(Gst.MapFlags.READ)
+        if not ok:
+            return None
+        try:
+            surf_ptr = ctypes.cast(map_info.data, ctypes.c_void_p)
+            if self._nvbufsurface.NvBufSurfaceMap(surf_ptr, 0, 0, 0) != 0:
+                return None
+            self._nvbufsurface.NvBufSurfaceSyncForCpu(surf_ptr, 0, 0)
+            mapped, pitch = _nvbuf_mapped_plane(surf_ptr)
+            if not mapped:
+                return None
+            pitch = pitch or width
+            # Rows are padded to the surface pitch at some resolutions, so
+            # view the Y plane pitch-wide and let process_frame slice the
+            # padding off. The UV plane is not needed for grayscale work.
+            frame = np.ctypeslib.as_array(
+                ctypes.cast(mapped, ctypes.POINTER(ctypes.c_uint8)),
+                shape=(height, pitch)).copy()
+            self._nvbufsurface.NvBufSurfaceUnMap(surf_ptr, 0, 0)
+            return frame
+        finally:
+            buf.unmap(map_info)
+
+    def process_frame(self, surface, width, height, stream_id):
+        # The Y plane of an NV12 surface is exactly the grayscale image: no
+        # cvtColor needed. Slice off any pitch padding on the right.
+        gray = np.asarray(surface)[:height, :width]
+        cuda_stream = self.cuda_streams[stream_id]
+        gpu_gray = self.gpu_grays[stream_id]
+        gpu_gray.upload(gray, cuda_stream)
+        gpu_edges = self.cannys[stream_id].detect(gpu_gray,
+                                                  stream=cuda_stream)
+        if self.cascade_on_gpu:
+            gpu_faces = self.face_cascades[stream_id].detectMultiScale(
+                gpu_gray)
+            faces = self.face_cascades[stream_id].convert(gpu_faces)
+        else:
+            faces = self.face_cascades[stream_id].detectMultiScale(
+                gray, 1.1, 4)
+        edges = gpu_edges.download(cuda_stream)
+        cuda_stream.waitForCompletion()
+        if len(faces):
+            print(f"stream {stream_id}: {len(faces)} face(s)")
+        return edges
+
+    def on_bus_message(self, bus, message):
+        if message.type == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            print(f"Error: {err} {debug}")
+            self.loop.quit()
+        elif message.type == Gst.MessageType.EOS:
+            self.loop.quit()
+        return True
+
+    def run(self):
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self.on_bus_message)
+        self.pipeline.set_state(Gst.State.PLAYING)
+        for stream_id in range(len(self.rtsp_urls)):
+            threading.Thread(target=self.pull_samples, args=(stream_id,),
+                             daemon=True).start()
+        try:
+            self.loop.run()
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def stop(self):
+        self.running = False
+        self.pipeline.set_state(Gst.State.NULL)
+
+
+def _nvbuf_mapped_plane(surf_ptr):
+    # Minimal view of NvBufSurface to reach surfaceList[0].mappedAddr.addr[0]
+    # and the plane pitch (layout from nvbufsurface.h, DeepStream 6.x).
+    class _NvBufSurfacePlaneParams(ctypes.Structure):
+        _fields_ = [("num_planes", ctypes.c_uint32),
+                    ("width", ctypes.c_uint32 * 4),
+                    ("height", ctypes.c_uint32 * 4),
+                    ("pitch", ctypes.c_uint32 * 4),
+                    ("offset", ctypes.c_uint32 * 4),
+                    ("psize", ctypes.c_uint32 * 4),
+                    ("bytesPerPix", ctypes.c_uint32 * 4),
+                    ("_reserved", ctypes.c_void_p * 4)]
+
+    class _NvBufSurfaceMappedAddr(ctypes.Structure):
+        _fields_ = [("addr", ctypes.c_void_p * 4),
+                    ("eglImage", ctypes.c_void_p),
+                    ("_reserved", ctypes.c_void_p * 4)]
+
+    class _NvBufSurfaceParams(ctypes.Structure):
+        _fields_ = [("width", ctypes.c_uint32),
+                    ("height", ctypes.c_uint32),
+                    ("pitch", ctypes.c_uint32),
+                    ("colorFormat", ctypes.c_int),
+                    ("layout", ctypes.c_int),
+                    ("bufferDesc", ctypes.c_uint64),
+                    ("dataSize", ctypes.c_uint32),
+                    ("dataPtr", ctypes.c_void_p),
+                    ("planeParams", _NvBufSurfacePlaneParams),
+                    ("mappedAddr", _NvBufSurfaceMappedAddr),
+                    ("_reserved", ctypes.c_void_p * 4)]
+
+    class _NvBufSurface(ctypes.Structure):
+        _fields_ = [("gpuId", ctypes.c_uint32),
+                    ("batchSize", ctypes.c_uint32),
+                    ("numFilled", ctypes.c_uint32),
+                    ("isContiguous", ctypes.c_bool),
+                    ("memType", ctypes.c_int),
+                    ("surfaceList", ctypes.POINTER(_NvBufSurfaceParams)),
+                    ("_reserved", ctypes.c_void_p * 4)]
+
+    surf = ctypes.cast(surf_ptr, ctypes.POINTER(_NvBufSurface)).contents
+    params = surf.surfaceList[0]
+    return params.mappedAddr.addr[0], params.planeParams.pitch[0]
+
+
+class PyNvDecoderProcessor:
+    # Alternate ingest without GStreamer: PyAV demuxes the RTSP H.264
+    # bitstream (demux only, no decode) and PyNvVideoCodec hands the packets
+    # straight to NVDEC. Decoded NV12 surfaces come back in device memory,
+    # so the Y plane is wrapped as a GpuMat and processed like the
+    # GStreamer path, with better NVDEC utilization on multi-stream ingest.
+
+    @staticmethod
+    def available():
+        return pnvc is not None and av is not None
+
+    def __init__(self, rtsp_urls):
+        self.rtsp_urls = rtsp_urls
+        self.running = True
+        # One set of CUDA resources per stream: decode_stream runs in a
+        # thread per stream, and the Canny detector and cascade classifier
+        # are stateful and not thread-safe.
+        n = len(rtsp_urls)
+        self.cuda_streams = {i: cv2.cuda_Stream(1) for i in range(n)}
+        self.cannys = {i: cv2.cuda.createCannyEdgeDetector(100, 200)
+                       for i in range(n)}
+        self.face_cascades = {
+            i: cv2.CascadeClassifier(
+                cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+            for i in range(n)}
+
+    def decode_stream(self, stream_id):
+        # A failure in one stream's decode path should be visible and only
+        # take down that stream, not die silently inside a daemon thread.
+        try:
+            self._decode_stream(stream_id)
+        except Exception as err:
+            print(f"stream {stream_id}: decode failed: {err}")
+
+    def _decode_stream(self, stream_id):
+        url = self.rtsp_urls[stream_id]
+        cuda_stream = self.cuda_streams[stream_id]
+        canny = self.cannys[stream_id]
+        face_cascade = self.face_cascades[stream_id]
+        container = av.open(url, options={"rtsp_transport": "tcp"})
+        video = container.streams.video[0]
+        width, height = video.width, video.height
+        decoder = pnvc.CreateDecoder(
+            gpuid=0,
+            codec=pnvc.cudaVideoCodec.H264,
+            usedevicememory=True,
+        )
+        for packet in container.demux(video):
+            if not self.running:
+                break
+            if packet.size == 0:
+                continue
+            for frame in decoder.Decode(bytes(packet)):
+                cai = frame.__cuda_array_interface__
+                strides = cai.get("strides")
+                pitch = strides[0] if strides else width
+                # The raw-pointer GpuMat constructor is not exposed in the
+                # Python bindings; createGpuMatFromCudaMemory (4.7+) is the
+                # bound way to wrap external device memory.
+                gpu_y = cv2.cuda.createGpuMatFromCudaMemory(
+                    height, width, cv2.CV_8UC1, cai["data"][0], pitch)
+                canny.detect(gpu_y, stream=cuda_stream)
+                gray = gpu_y.download(cuda_stream)
+                cuda_stream.waitForCompletion()
+                faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+                if len(faces):
+                    print(f"stream {stream_id}: {len(faces)} face(s)")
+        container.close()
+
+    def run(self):
+        threads = []
+        for stream_id in range(len(self.rtsp_urls)):
+            t = threading.Thread(target=self.decode_stream,
+                                 args=(stream_id,), daemon=True)
+            t.start()
+            threads.append(t)
+        try:
+            for t in threads:
+                t.join()
+        except KeyboardInterrupt:
+            self.running = False
+
+
+if __name__ == "__main__":
+    urls = sys.argv[1:]
+    if not urls:
+        print("usage: mytest_deepstream.py <rtsp_url> [<rtsp_url> ...]")
+        sys.exit(1)
+    if PyNvDecoderProcessor.available():
+        PyNvDecoderProcessor(urls).run()
+    else:
+        DeepStreamOpenCVProcessor(urls).run()
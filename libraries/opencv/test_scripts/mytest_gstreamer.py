@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# Open an RTSP (or file) source through GStreamer with whatever hardware
+# decoder is available and read the frames with cv2.VideoCapture.
+
+import functools
+import sys
+
+import cv2
+
+# Hardware decoders in order of preference, then the software fallback.
+H264_DECODERS = ["nvv4l2decoder", "nvh264dec", "vaapih264dec", "avdec_h264"]
+
+
+@functools.lru_cache(maxsize=None)
+def check_plugin_available(plugin_name):
+    # Ask the in-process GStreamer registry instead of spawning
+    # gst-inspect-1.0, which costs a few hundred ms per probe and needs the
+    # tool on PATH. The cache makes repeated builds free.
+    try:
+        import gi
+        gi.require_version("Gst", "1.0")
+        from gi.repository import Gst
+    except (ImportError, ValueError):
+        return False
+    if not Gst.is_initialized():
+        Gst.init(None)
+    return Gst.ElementFactory.find(plugin_name) is not None
+
+
+def build_pipeline(source, target_shape=(360, 640)):
+    height, width = target_shape
+
+    decoder = None
+    for candidate in H264_DECODERS:
+        if check_plugin_available(candidate):
+            decoder = candidate
+            break
+
+    if source.startswith("rtsp://"):
+        src_str = (f"rtspsrc location={source} protocols=tcp latency=200 ! "
+                   f"rtpjitterbuffer latency=200 drop-on-latency=true ! "
+                   f"rtph264depay ! h264parse")
+    else:
+        src_str = f"filesrc location={source} ! qtdemux ! h264parse"
+
+    if decoder == "nvv4l2decoder":
+        # nvvideoconvert scales on the VIC when the output caps ask for the
+        # target size, so the frame is already small before it ever lands in
+        # system memory and no videoscale element is needed.
+        return (f"{src_str} ! nvv4l2decoder ! nvvideoconvert ! "
+                f"video/x-raw,format=BGRx,width={width},height={height} ! "
+                f"videoconvert ! video/x-raw,format=BGR ! "
+                f"queue leaky=downstream max-size-buffers=4 "
+                f"max-size-bytes=0 max-size-time=0 ! "
+                f"appsink max-buffers=4 drop=true sync=false")
+    elif decoder:
+        # Other decoders: prefer a hardware postproc for the resize, and only
+        # fall back to the CPU videoscale when none is available.
+        if check_plugin_available("vaapipostproc"):
+            scale_str = f"vaapipostproc width={width} height={height}"
+        elif check_plugin_available("v4l2convert"):
+            scale_str = (f"v4l2convert ! "
+                         f"video/x-raw,width={width},height={height}")
+        else:
+            scale_str = (f"videoscale ! "
+                         f"video/x-raw,width={width},height={height}")
+        return (f"{src_str} ! {decoder} ! {scale_str} ! "
+                f"videoconvert ! video/x-raw,format=BGR ! "
+                f"queue leaky=downstream max-size-buffers=4 "
+                f"max-size-bytes=0 max-size-time=0 ! "
+                f"appsink max-buffers=4 drop=true sync=false")
+    else:
+        print("No H.264 decoder found")
+        return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: mytest_gstreamer.py <rtsp_url_or_file>")
+        sys.exit(1)
+
+    source = build_pipeline(sys.argv[1])
+    if source is None:
+        sys.exit(1)
+    print(source)
+
+    # The pipeline string must go through the GStreamer backend; the default
+    # backend would hand the raw URL to FFmpeg and decode in software.
+    cap = cv2.VideoCapture(source, cv2.CAP_GSTREAMER)
+    if not cap.isOpened():
+        # Diagnostics fallback: try the plain source so it is obvious whether
+        # the pipeline or the stream itself is the problem. Check with
+        # tegrastats that NVDEC is busy when the GStreamer path works.
+        print("GStreamer pipeline failed to open, "
+              "falling back to software decode")
+        cap = cv2.VideoCapture(sys.argv[1])
+        if not cap.isOpened():
+            print("Source failed to open at all")
+            sys.exit(1)
+
+    frames = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames += 1
+        if frames % 100 == 0:
+            print(f"{frames} frames, shape {frame.shape}")
+    cap.release()
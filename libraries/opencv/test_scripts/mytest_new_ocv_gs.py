@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+
+# Decode RTSP streams with one GStreamer pipeline per stream and process the
+# frames with OpenCV.
+
+import concurrent.futures
+import ctypes
+import queue
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+import gi
+
+gi.require_version("Gst", "1.0")
+gi.require_version("GstApp", "1.0")
+from gi.repository import Gst, GstApp, GLib  # noqa: F401 (GstApp adds the
+# appsink pull API to the introspected element class)
+
+# CV-CUDA is optional: when present, the grayscale conversion and edge
+# detection run as a fused sequence on preallocated tensors.
+try:
+    import cvcuda
+except ImportError:
+    cvcuda = None
+
+Gst.init(None)
+
+
+class _DeviceArray:
+    # Minimal __cuda_array_interface__ shim so CV-CUDA can wrap the
+    # registered zero-copy buffers without copying them.
+    def __init__(self, host, devptr):
+        self.__cuda_array_interface__ = {
+            "shape": host.shape,
+            "typestr": "|u1",
+            "data": (devptr, False),
+            "strides": host.strides,
+            "version": 2,
+        }
+
+
+class CudaHostRegistry:
+    # Zero-copy on Jetson: CPU and GPU share the same DRAM, so instead of
+    # uploading each frame, pin a host buffer once with cudaHostRegister and
+    # wrap the device pointer it maps to. Uses the CUDA runtime API; the
+    # driver API fails with an invalid-context error before the first
+    # runtime call.
+    CUDA_HOST_REGISTER_MAPPED = 2
+
+    def __init__(self):
+        try:
+            self.cudart = ctypes.CDLL("libcudart.so")
+        except OSError:
+            self.cudart = None
+        self.registered = {}
+
+    def device_pointer(self, array):
+        # Returns the device pointer for the (registered-once) host array,
+        # or None when zero-copy is not available.
+        if self.cudart is None:
+            return None
+        host_ptr = array.ctypes.data
+        if host_ptr in self.registered:
+            return self.registered[host_ptr]
+        status = self.cudart.cudaHostRegister(
+            ctypes.c_void_p(host_ptr), ctypes.c_size_t(array.nbytes),
+            self.CUDA_HOST_REGISTER_MAPPED)
+        if status != 0:
+            return None
+        devptr = ctypes.c_void_p()
+        status = self.cudart.cudaHostGetDevicePointer(
+            ctypes.byref(devptr), ctypes.c_void_p(host_ptr), 0)
+        if status != 0:
+            self.cudart.cudaHostUnregister(ctypes.c_void_p(host_ptr))
+            return None
+        self.registered[host_ptr] = devptr.value
+        return devptr.value
+
+    def release(self):
+        if self.cudart is None:
+            return
+        for host_ptr in self.registered:
+            self.cudart.cudaHostUnregister(ctypes.c_void_p(host_ptr))
+        self.registered.clear()
+
+
+class GstreamerOpenCVProcessor:
+    def __init__(self, rtsp_urls):
+        self.rtsp_urls = rtsp_urls
+        self.loop = GLib.MainLoop()
+        self.pipelines = []
+        self.sinks = []
+        # One single-slot queue per stream: the producer replaces the queued
+        # frame when the consumer is behind, the consumer blocks instead of
+        # polling.
+        self.queues = {i: queue.Queue(maxsize=1) for i in range(len(rtsp_urls))}
+        # Ring of preallocated host buffers per stream, sized on the first
+        # frame: the producer copies into a recycled buffer instead of
+        # allocating ~2.7 MB per frame. Slots are checked out to the consumer
+        # and released after processing, so a slow consumer (Haar at 720p can
+        # take several frame periods) never has its frame overwritten.
+        self.host_rings = {i: [] for i in range(len(rtsp_urls))}
+        self.ring_slots = {i: 0 for i in range(len(rtsp_urls))}
+        self.slot_busy = {i: [False] * self.RING_N
+                          for i in range(len(rtsp_urls))}
+        self.host_registry = CudaHostRegistry()
+        # Per-stream CV-CUDA output tensors: None until first use, False
+        # when the CV-CUDA path is known to be unavailable.
+        self.cvcuda_bufs = {i: None for i in range(len(rtsp_urls))}
+        self.running = True
+        # The consumers run in a thread pool, one worker per stream, so each
+        # stream owns its own CUDA resources: OpenCV releases the GIL inside
+        # its CUDA calls, and with per-stream cv2.cuda streams the GPU work
+        # of the streams overlaps instead of serializing on one shared
+        # stream. Everything is created once and reused. The streams are
+        # created non-blocking (cudaStreamNonBlocking): work on the default
+        # stream would implicitly synchronize with NVDEC's decode stream and
+        # make the FPS oscillate.
+        self.pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(rtsp_urls))
+        self.cuda_streams = {i: cv2.cuda_Stream(1)
+                             for i in range(len(rtsp_urls))}
+        self.gpu_frames = {i: cv2.cuda_GpuMat() for i in range(len(rtsp_urls))}
+        self.gpu_grays = {i: cv2.cuda_GpuMat() for i in range(len(rtsp_urls))}
+        self.cannys = {i: cv2.cuda.createCannyEdgeDetector(100, 200)
+                       for i in range(len(rtsp_urls))}
+        # Parsing the cascade XML takes tens of milliseconds, so build the
+        # classifiers once here, never per frame — and one per stream, since
+        # detectMultiScale keeps internal state and the consumers run
+        # concurrently.
+        self.face_cascades = {
+            i: cv2.CascadeClassifier(
+                cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+            for i in range(len(rtsp_urls))}
+
+        for i, url in enumerate(rtsp_urls):
+            pipeline_str = (
+                # latency=0 disables the jitter buffer, so any network
+                # hiccup turns into drops and retransmit stalls that leave
+                # NVDEC alternating between idle and bursts. A 200 ms buffer
+                # over TCP keeps the bitstream feed smooth.
+                f"rtspsrc location={url} protocols=tcp latency=200 "
+                f"drop-on-latency=true ! "
+                f"rtpjitterbuffer latency=200 drop-on-latency=true ! "
+                f"rtph264depay ! h264parse ! nvv4l2decoder ! "
+                # Take BGRx straight from nvvideoconvert: a software
+                # videoconvert to BGR would repack every frame on one CPU
+                # core per stream just to strip the padding byte.
+                f"nvvideoconvert ! video/x-raw,format=BGRx ! "
+                # A short leaky queue decouples the decoder from the Python
+                # consumer: the decoder keeps running at a steady rate while
+                # the sink drops stale frames instead of stalling NVDEC.
+                f"queue leaky=downstream max-size-buffers=4 "
+                f"max-size-bytes=0 max-size-time=0 ! "
+                f"appsink name=appsink{i} "
+                f"max-buffers=4 drop=true sync=false"
+            )
+            pipeline = Gst.parse_launch(pipeline_str)
+            # Samples are pulled from dedicated threads instead of a GObject
+            # signal per frame: signal marshalling crosses the Python/GI
+            # boundary twice per sample and caps aggregate throughput.
+            sink = pipeline.get_by_name(f"appsink{i}")
+            sink.set_property("emit-signals", False)
+            self.sinks.append(sink)
+            self.pipelines.append(pipeline)
+
+    def pull_samples(self, stream_id):
+        sink = self.sinks[stream_id]
+        while self.running:
+            # The timeout lets the thread notice shutdown.
+            sample = sink.try_pull_sample(Gst.SECOND)
+            if sample is not None:
+                self.handle_sample(sample, stream_id)
+
+    def handle_sample(self, sample, stream_id):
+        buf = sample.get_buffer()
+        caps = sample.get_caps().get_structure(0)
+        width = caps.get_value("width")
+        height = caps.get_value("height")
+        ok, map_info = buf.map(Gst.MapFlags.READ)
+        if not ok:
+            return
+        try:
+            frame = np.ndarray(shape=(height, width, 4), dtype=np.uint8,
+                               buffer=map_info.data)
+            # One pass: compact BGRx to BGR straight into a recycled (pinned
+            # when available) buffer. The copy is needed anyway so the frame
+            # outlives the unmap; this way it allocates nothing.
+            slot_idx, slot = self.next_host_buffer(stream_id, height, width)
+            if slot is None:
+                return  # Every ring slot is checked out: drop the frame.
+            np.copyto(slot[1], frame[:, :, :3])
+            self.publish_frame(stream_id, (slot_idx, slot))
+        finally:
+            buf.unmap(map_info)
+
+    RING_N = 4  # matches the appsink/leaky-queue depth
+
+    def next_host_buffer(self, stream_id, height, width):
+        # Each ring slot is (owner, host array, GpuMat alias or None,
+        # device pointer or None).
+        ring = self.host_rings[stream_id]
+        if not ring:
+            for _ in range(self.RING_N):
+                host = np.empty((height, width, 3), np.uint8)
+                devptr = self.host_registry.device_pointer(host)
+                if devptr is not None:
+                    # CPU and GPU share DRAM on Jetson, so the GpuMat can
+                    # alias the registered host buffer: no per-frame upload.
+                    # The raw-pointer GpuMat constructor is not exposed in
+                    # the Python bindings; createGpuMatFromCudaMemory (4.7+)
+                    # is the bound way to wrap external device memory.
+                    gpu = cv2.cuda.createGpuMatFromCudaMemory(
+                        height, width, cv2.CV_8UC3, devptr, host.strides[0])
+                    ring.append((None, host, gpu, devptr))
+                    continue
+                try:
+                    # No zero-copy: at least make the upload an async DMA
+                    # from pinned memory.
+                    mem = cv2.cuda_HostMem(height, width, cv2.CV_8UC3)
+                    ring.append((mem, mem.createMatHeader(), None, None))
+                except AttributeError:
+                    ring.append((None, host, None, None))
+        # Hand out only slots the consumer is not still reading: the queue
+        # hand-off is by reference, so reusing a checked-out slot would tear
+        # the frame mid-processing. When every slot is checked out, drop the
+        # frame, same as the leaky queues upstream.
+        busy = self.slot_busy[stream_id]
+        start = self.ring_slots[stream_id]
+        for step in range(self.RING_N):
+            idx = (start + step) % self.RING_N
+            if not busy[idx]:
+                busy[idx] = True
+                self.ring_slots[stream_id] = (idx + 1) % self.RING_N
+                return idx, ring[idx]
+        return None, None
+
+    def release_slot(self, stream_id, slot_idx):
+        self.slot_busy[stream_id][slot_idx] = False
+
+    def publish_frame(self, stream_id, item):
+        # Drop the oldest frame when the consumer is behind, releasing the
+        # slot of whatever gets dropped.
+        q = self.queues[stream_id]
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            try:
+                dropped = q.get_nowait()
+                if dropped is not None:
+                    self.release_slot(stream_id, dropped[0])
+            except queue.Empty:
+                pass
+            try:
+                q.put_nowait(item)
+            except queue.Full:
+                if item is not None:
+                    self.release_slot(stream_id, item[0])
+
+    def _cvcuda_gray_and_edges(self, frame, devptr, stream_id):
+        # Fused CV-CUDA sequence into preallocated tensors: the conversion
+        # and edge detection are launched back to back on the GPU with no
+        # intermediate host round trip, one global-memory pass per op. The
+        # output tensors alias registered zero-copy host buffers, so after
+        # the sync the Haar stage reads `gray` directly.
+        bufs = self.cvcuda_bufs[stream_id]
+        if bufs is False:
+            return None
+        try:
+            if bufs is None:
+                height, width = frame.shape[:2]
+                bufs = {}
+                for name in ("gray", "edges"):
+                    host = np.zeros((height, width, 1), np.uint8)
+                    hdev = self.host_registry.device_pointer(host)
+                    if hdev is None:
+                        raise RuntimeError("zero-copy buffers unavailable")
+                    bufs[name] = (host,
+                                  cvcuda.as_tensor(_DeviceArray(host, hdev),
+                                                   "HWC"))
+                self.cvcuda_bufs[stream_id] = bufs
+            src = cvcuda.as_tensor(_DeviceArray(frame, devptr), "HWC")
+            cvcuda.cvtcolor_into(bufs["gray"][1], src,
+                                 cvcuda.ColorConversion.BGR2GRAY)
+            cvcuda.canny_into(bufs["edges"][1], bufs["gray"][1], 100, 200)
+            cvcuda.Stream.current.sync()
+            return bufs["gray"][0][:, :, 0]
+        except Exception:
+            # Missing operator or wrap failure: fall back to the cv2.cuda
+            # path for good on this stream.
+            self.cvcuda_bufs[stream_id] = False
+            return None
+
+    def process_frame(self, frame, gpu_frame, devptr, stream_id):
+        gray = None
+        if cvcuda is not None and devptr is not None:
+            gray = self._cvcuda_gray_and_edges(frame, devptr, stream_id)
+        if gray is None:
+            cuda_stream = self.cuda_streams[stream_id]
+            gpu_gray = self.gpu_grays[stream_id]
+            if gpu_frame is None:
+                self.gpu_frames[stream_id].upload(frame, cuda_stream)
+                gpu_frame = self.gpu_frames[stream_id]
+            cv2.cuda.cvtColor(gpu_frame, cv2.COLOR_BGR2GRAY,
+                              dst=gpu_gray, stream=cuda_stream)
+            gpu_edges = self.cannys[stream_id].detect(gpu_gray,
+                                                      stream=cuda_stream)
+            # The Haar stage needs the grayscale image back on the host.
+            gray = gpu_gray.download(cuda_stream)
+            cuda_stream.waitForCompletion()
+        faces = self.face_cascades[stream_id].detectMultiScale(gray, 1.1, 4)
+        for (x, y, w, h) in faces:
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        if len(faces):
+            print(f"stream {stream_id}: {len(faces)} face(s)")
+        return frame
+
+    def process_frames(self, stream_id):
+        # One pool worker per stream, blocking on its queue: each frame is
+        # processed exactly once, no CPU is burnt while waiting, and the
+        # streams' GPU work overlaps on their own CUDA streams.
+        q = self.queues[stream_id]
+        while self.running:
+            item = q.get()
+            if item is None:
+                break
+            # The producer already copied the frame out of the GStreamer
+            # buffer; the ring slot stays checked out to this consumer until
+            # processing finishes, so the producer cannot overwrite it.
+            slot_idx, slot = item
+            _, frame, gpu_frame, devptr = slot
+            try:
+                self.process_frame(frame, gpu_frame, devptr, stream_id)
+            finally:
+                self.release_slot(stream_id, slot_idx)
+
+    def on_bus_message(self, bus, message):
+        if message.type == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            print(f"Error: {err} {debug}")
+            self.loop.quit()
+        elif message.type == Gst.MessageType.EOS:
+            self.loop.quit()
+        return True
+
+    def run(self):
+        for pipeline in self.pipelines:
+            bus = pipeline.get_bus()
+            bus.add_signal_watch()
+            bus.connect("message", self.on_bus_message)
+            pipeline.set_state(Gst.State.PLAYING)
+        for stream_id in range(len(self.rtsp_urls)):
+            threading.Thread(target=self.pull_samples, args=(stream_id,),
+                             daemon=True).start()
+            self.pool.submit(self.process_frames, stream_id)
+        try:
+            self.loop.run()
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def stop(self):
+        self.running = False
+        for stream_id in range(len(self.rtsp_urls)):
+            self.publish_frame(stream_id, None)  # Wake the consumers
+        self.pool.shutdown(wait=True)
+        for pipeline in self.pipelines:
+            pipeline.set_state(Gst.State.NULL)
+        self.host_registry.release()
+
+
+if __name__ == "__main__":
+    urls = sys.argv[1:]
+    if not urls:
+        print("usage: mytest_new_ocv_gs.py <rtsp_url> [<rtsp_url> ...]")
+        sys.exit(1)
+    GstreamerOpenCVProcessor(urls).run()